@@ -1,16 +1,118 @@
 import csv
+import email.utils
 import time
 import requests
 import argparse
 import math
 import os
 import json
+import random
 import datetime  # Added for timestamp
+import html
+import threading
+from collections import Counter, deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from functools import lru_cache
+from itertools import chain
+from operator import itemgetter
+from requests.adapters import HTTPAdapter
+
+try:
+    import zstandard
+except ImportError:  # optional: without it the cache is plain JSON
+    zstandard = None
+try:
+    import orjson
+except ImportError:  # optional: stdlib json reads and writes the same files
+    orjson = None
 
 CACHE_DIR = 'cache'
-REQUEST_DELAY = 1  # seconds
+RATE_LIMIT = 60  # requests per RATE_PERIOD, shared by all fetch threads (OpenDota's free tier)
+RATE_PERIOD = 60  # seconds
+MAX_WORKERS = 8  # concurrent OpenDota fetches
+MAX_ATTEMPTS = 6  # per request, when rate limited
+REQUEST_TIMEOUT = (5, 30)  # seconds: connect, read
+
+# name -> (days passed to the API, label shown in the report)
+TIME_FRAMES = {
+    'all_time': (None, 'All Time'),
+    'last_2_years': (730, 'Last 2 Years'),
+    'last_9_months': (270, 'Last 9 Months'),
+}
+DEFAULT_TIME_FRAME = next(iter(TIME_FRAMES))  # selected when the report opens
+WRITE_BUFFER = 1 << 20  # bytes buffered before the report is flushed to disk
+ZSTD_LEVEL = 3  # cache compression level when zstandard is available
+HERO_STATS_TTL = 7 * 86400  # seconds; the hero roster only changes on patch days
+# seconds before a player's cached hero list is revalidated: short windows move fastest
+PLAYER_HEROES_TTL = {
+    'all_time': 72 * 3600,
+    'last_2_years': 24 * 3600,
+    'last_9_months': 6 * 3600,
+}
+CACHE_FILE = 'hero_stats_cache.json'  # every response, loaded once and saved once per run
+HERO_IMG_URL = 'https://cdn.cloudflare.steamstatic.com/apps/dota2/images/dota_react/heroes/{key}.png'
 API_KEY = None  # Will be loaded from opendota.properties
 
+NOT_MODIFIED = object()  # returned by make_api_request on HTTP 304
+# name -> {'fetched_at', 'etag', 'last_modified', 'data'} for each cached response
+cache = {}
+inflight = {}  # (url, params) -> Future of the make_api_request call already on the wire
+inflight_lock = threading.Lock()
+
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS, max_retries=0))
+
+
+class RateLimiter:
+    """At most `calls` requests in any trailing `period` seconds, shared by the fetch threads."""
+
+    def __init__(self, calls, period):
+        self.calls = calls
+        self.period = period
+        self.stamps = deque()  # monotonic send times inside the current window
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.stamps and now - self.stamps[0] >= self.period:
+                    self.stamps.popleft()
+                if len(self.stamps) < self.calls:
+                    self.stamps.append(now)
+                    return
+                wait = self.period - (now - self.stamps[0])
+            time.sleep(wait)
+
+
+class AIMDLimiter:
+    """Caps in-flight requests: +step on each success, halved on 429/5xx."""
+
+    def __init__(self, start=4, low=1, high=MAX_WORKERS, step=0.5):
+        self.limit = start
+        self.low, self.high, self.step = low, high, step
+        self.in_flight = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_flight >= int(self.limit):
+                self.cond.wait()
+            self.in_flight += 1
+
+    def release(self, ok):
+        with self.cond:
+            self.in_flight -= 1
+            if ok:
+                self.limit = min(self.high, self.limit + self.step)
+            else:
+                self.limit = max(self.low, self.limit / 2)
+            self.cond.notify_all()
+
+
+rate_limiter = RateLimiter(RATE_LIMIT, RATE_PERIOD)
+concurrency = AIMDLimiter()
+
 
 def load_api_key():
     global API_KEY
@@ -26,49 +128,291 @@ def load_api_key():
         print("opendota.properties file not found. Continuing without API key.")
 
 
-def make_api_request(url, params=None):
+def retry_delay(r, attempt):
+    """Seconds to wait after a 429: the server's Retry-After, else jittered backoff."""
+    retry_after = r.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return min(60, 0.5 * 2**attempt) + random.random()
+
+
+def make_api_request(url, params=None, cached=None):
+    """Returns (data, validators). data is NOT_MODIFIED if the server answered 304.
+
+    cached is our cache entry (or None); its ETag/Last-Modified are sent as a conditional GET.
+    Concurrent calls for the same url and params share a single HTTP request.
+    """
+    key = (url, frozenset((params or {}).items()))
+    with inflight_lock:
+        fut = inflight.get(key)
+        owner = fut is None
+        if owner:
+            fut = inflight[key] = Future()
+    if not owner:
+        return fut.result()
+    try:
+        fut.set_result(send_api_request(url, params, cached))
+    except BaseException as e:
+        fut.set_exception(e)
+    finally:
+        with inflight_lock:
+            del inflight[key]
+    return fut.result()
+
+
+def send_api_request(url, params=None, cached=None):
     if API_KEY:
         params = params or {}
         params['api_key'] = API_KEY
-    try:
-        r = requests.get(url, params=params)
+    headers = {}
+    if cached and cached.get('etag'):
+        headers['If-None-Match'] = cached['etag']
+    if cached and cached.get('last_modified'):
+        headers['If-Modified-Since'] = cached['last_modified']
+    for attempt in range(MAX_ATTEMPTS):
+        concurrency.acquire()
+        ok = False
+        try:
+            rate_limiter.acquire()
+            r = SESSION.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+            ok = r.status_code != 429 and r.status_code < 500
+        except requests.RequestException as e:
+            print(f"Request failed: {e}")
+            return None, None
+        finally:
+            concurrency.release(ok)
         if r.status_code == 429:
-            print("Rate limit exceeded. Sleeping for 60 seconds.")
-            time.sleep(60)
-            return make_api_request(url, params)
+            delay = retry_delay(r, attempt)
+            print(f"Rate limit exceeded. Retrying in {delay:.1f} seconds.")
+            time.sleep(delay)
+        elif r.status_code == 304:
+            return NOT_MODIFIED, cached
         elif r.status_code == 200:
-            time.sleep(REQUEST_DELAY)
-            return r.json()
+            return (orjson or json).loads(r.content), {'etag': r.headers.get('ETag'), 'last_modified': r.headers.get('Last-Modified')}
         else:
             print(f"Error {r.status_code} for URL: {url}")
-            return None
-    except requests.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
+            return None, None
+    print(f"Giving up on {url} after {MAX_ATTEMPTS} rate-limited attempts")
+    return None, None
+
+
+REPORT_HEAD = """\
+<!DOCTYPE html>
+<html lang="en">
+<head>
+  <meta charset="UTF-8">
+  <meta name="viewport" content="width=device-width, initial-scale=1.0">
+  <title>Sealson Hero Report</title>
+<style>
+body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #1e1e1e; color: #f0f0f0; }
+.timeframe-container { margin-bottom: 20px; }
+.timeframe-container select { padding: 8px 12px; font-size: 1em; border-radius: 4px; background-color: #333; color: #f0f0f0; border: 1px solid #555; }
+.container { display: flex; flex-wrap: wrap; }
+.hero { width: 48%; box-sizing: border-box; padding: 10px; margin: 1%; border: 1px solid #444; border-radius: 4px; background-color: #2a2a2a; }
+.hero h2 { margin: 0 0 10px; }
+.hero img { display: block; margin: 0 auto 10px; width: 125px; }
+table { width: 100%; border-collapse: collapse; margin-bottom: 5px; table-layout: fixed; }
+th, td { border: 1px solid #555; padding: 6px; text-align: center; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }
+th { background-color: #333; cursor: pointer; }
+th:nth-child(1), td:nth-child(1) { width: 45%; }
+th:nth-child(2), td:nth-child(2), th:nth-child(3), td:nth-child(3) { width: 15%; }
+th:nth-child(4), td:nth-child(4), th:nth-child(5), td:nth-child(5) { width: 12.5%; }
+tr:nth-child(even) { background-color: #2e2e2e; }
+tr:nth-child(odd) { background-color: #262626; }
+tr.hidden { display: none; }
+button.toggle { display: block; margin: 5px auto; padding: 6px 12px; font-size: 0.9em; background: #444; color: #fff; border: none; border-radius: 3px; cursor: pointer; }
+button.toggle:hover { background: #555; }
+.tooltip { position: relative; display: inline-block; cursor: help; }
+.tooltip .tooltiptext { visibility: hidden; width: 220px; background-color: #333; color: #fff; text-align: center; border-radius: 4px; padding: 5px; position: absolute; z-index: 1; bottom: 125%; left: 50%; transform: translateX(-50%); opacity: 0; transition: opacity 0.3s; }
+.tooltip:hover .tooltiptext { visibility: visible; opacity: 1; }
+.trophies { margin: 40px auto; width: 50%; border-collapse: collapse; }
+.trophies th, .trophies td { border: 1px solid #555; padding: 6px; text-align: center; }
+.trophies th { background-color: #444; }
+</style>
+<script>
+document.addEventListener("DOMContentLoaded", ()=>{
+  const timeSelect = document.getElementById("timeFrameSelect");
+  function toggleTimeFrame(){ const tf=timeSelect.value; document.querySelectorAll(".hero").forEach(hero=>{hero.querySelectorAll("table").forEach(tbl=>tbl.style.display=tbl.classList.contains(tf)?"table":"none"); const btn=hero.querySelector("button.toggle"); btn.textContent="Show all"; hero.querySelectorAll(`table.${tf} tbody tr.hidden`).forEach(r=>r.style.display="none");});}
+  timeSelect.addEventListener("change",toggleTimeFrame);
+  document.querySelectorAll("button.toggle").forEach(btn=>btn.addEventListener("click",()=>{ const heroId=btn.dataset.hero; const tf=timeSelect.value; const show=btn.textContent==="Show all"; document.querySelectorAll(`#hero_${heroId} table.${tf} tbody tr.hidden`).forEach(r=>r.style.display=show?"table-row":"none"); btn.textContent=show?"Show top 5":"Show all";}));
+  function sortTable(tbl,col,asc){ const tb=tbl.tBodies[0]; Array.from(tb.rows).sort((a,b)=>{ const A=a.cells[col].textContent.trim(),B=b.cells[col].textContent.trim(),nA=parseFloat(A),nB=parseFloat(B); if(!isNaN(nA)&&!isNaN(nB))return asc?nA-nB:nB-nA; return asc?A.localeCompare(B):B.localeCompare(A); }).forEach(r=>tb.appendChild(r));}
+  document.querySelectorAll("table").forEach(tbl=>Array.from(tbl.tHead.rows[0].cells).forEach((th,i)=>{let asc=true;th.addEventListener("click",()=>{sortTable(tbl,i,asc);asc=!asc;});}));
+  if(timeSelect.selectedIndex!==0)toggleTimeFrame();
+});
+</script>
+</head>
+<body>
+"""
+
+
+TABLE_HEAD = ('<table class="{tf}"{style}>\n<thead><tr><th>Player</th><th>Games</th><th>Wins</th>'
+              '<th>Win Rate</th><th>Score</th></tr></thead>\n<tbody>\n')
+TABLE_CELLS = ('<td>{name}</td><td>{games}</td><td>{wins}</td>'
+               '<td>{winrate:.2f}%</td><td>{score:.4f}</td></tr>\n')
+# Row templates take a stats dict as-is via format_map, no per-row kwargs dict
+TABLE_ROW = '<tr>' + TABLE_CELLS
+TABLE_ROW_HIDDEN = '<tr class="hidden">' + TABLE_CELLS
+TABLE_FOOT = '</tbody>\n</table>\n'
+TABLE_EMPTY = '<tr><td colspan="5">No games played</td></tr>\n'  # replaces P rows of zeros
+# Timeframe selector; only depends on TIME_FRAMES, so it is built once at import
+TIME_FRAME_SELECT = (
+    '<div class="timeframe-container"><label for="timeFrameSelect">Time Frame:</label>'
+    '<select id="timeFrameSelect">\n'
+    + ''.join(f'<option value="{tf}">{label}</option>\n' for tf, (_, label) in TIME_FRAMES.items())
+    + '</select></div>\n'
+)
+
+
+GAMMA = 0.69
+# log(games+1)**GAMMA for the game counts players realistically reach
+LOG_WEIGHTS = [math.log(g+1)**GAMMA for g in range(10001)]
 
 
-def adjusted_score(wins, games, gamma=0.69):
-    if games == 0:
-        return 0
-    return (wins/games) * (math.log(games+1)**gamma)
+@lru_cache(maxsize=4096)
+def log_weight(games, gamma=GAMMA):
+    # Memoized fallback for counts past the end of LOG_WEIGHTS or a non-default gamma
+    return math.log(games+1)**gamma
+
+
+def score_records(recs):
+    """hero_id -> (games, wins, winrate %, adjusted score) for one player's hero list."""
+    scored = {}
+    weights, n_weights = LOG_WEIGHTS, len(LOG_WEIGHTS)
+    for x in recs:
+        w, g = x.get('win', 0), x.get('games', 0)
+        if g <= 0:
+            scored[x['hero_id']] = (g, w, 0, 0)
+            continue
+        # Adjusted score: winrate scaled by log(games+1)**GAMMA, from the table when in range
+        rate = w/g
+        weight = weights[g] if g < n_weights else log_weight(g)
+        scored[x['hero_id']] = (g, w, rate*100, rate*weight)
+    return scored
+
+
+def cache_path(fn):
+    """Where fn is cached: zstd-compressed when zstandard is installed, plain JSON otherwise."""
+    path = os.path.join(CACHE_DIR, fn)
+    return path + '.zst' if zstandard else path
 
 
 def cache_data(fn, data):
     os.makedirs(CACHE_DIR, exist_ok=True)
-    path = os.path.join(CACHE_DIR, fn)
-    with open(path, 'w', encoding='utf-8') as f:
-        json.dump(data, f)
+    raw = orjson.dumps(data) if orjson else json.dumps(data).encode('utf-8')
+    if zstandard:
+        raw = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    path = cache_path(fn)
+    with open(path + '.tmp', 'wb') as f:
+        f.write(raw)
+    os.replace(path + '.tmp', path)
     print(f"Cached data to {fn}")
 
 
 def load_cached_data(fn):
-    path = os.path.join(CACHE_DIR, fn)
-    try:
-        with open(path, 'r', encoding='utf-8') as f:
-            print(f"Loaded cached data from {fn}")
-            return json.load(f)
-    except FileNotFoundError:
+    # Read whichever copy was written last, so a cache written before zstandard was
+    # installed (or after it was removed) still loads; .zst needs zstandard to read
+    plain = os.path.join(CACHE_DIR, fn)
+    paths = [p for p in ([plain + '.zst', plain] if zstandard else [plain]) if os.path.exists(p)]
+    if not paths:
+        return None
+    path = max(paths, key=os.path.getmtime)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    if path.endswith('.zst'):
+        raw = zstandard.ZstdDecompressor().decompress(raw)
+    print(f"Loaded cached data from {fn}")
+    return (orjson or json).loads(raw)
+
+
+def render_table(tf, stats, visible=5):
+    top, rest = stats[:visible], stats[visible:]
+    # The first time frame is what the page opens on; hide the others up front
+    # so the browser doesn't have to restyle every table on load
+    style = '' if tf == DEFAULT_TIME_FRAME else ' style="display:none"'
+    parts = [TABLE_HEAD.format(tf=tf, style=style)]
+    if any(p['games'] for p in stats):
+        parts.extend(map(TABLE_ROW.format_map, top))
+        parts.extend(map(TABLE_ROW_HIDDEN.format_map, rest))
+    else:
+        parts.append(TABLE_EMPTY)
+    parts.append(TABLE_FOOT)
+    return ''.join(parts)
+
+
+def emit_hero_section(hid, lname, img_url, hero_stats):
+    yield f'<div class="hero" id="hero_{hid}">\n'
+    yield f'<h2>{lname}</h2>\n'
+    yield f'<img src="{img_url}" alt="{lname}">\n'
+    yield f'<button class="toggle" data-hero="{hid}">Show all</button>\n'
+    for tf in hero_stats:
+        yield render_table(tf, hero_stats[tf][hid])
+    yield '</div>\n'
+
+
+def emit_trophies(sorted_trophies, top=5):
+    yield '<h2 style="text-align:center; margin-top:40px;">Top 5 Trophy Leaders '
+    yield '<span class="tooltip">?'
+    yield '<span class="tooltiptext">Trophy points: 3 for 1st, 2 for 2nd, 1 for 3rd on each hero.</span>'
+    yield '</span></h2>\n'
+    yield '<table class="trophies">\n<thead><tr><th>Player</th><th>Trophy Points</th></tr></thead>\n<tbody>\n'
+    for name, pts in sorted_trophies[:top]:
+        yield f'<tr><td>{name}</td><td>{pts}</td></tr>\n'
+    yield '</tbody>\n</table>\n'
+
+
+def read_players(path):
+    """Parse the players CSV once into [{'name', 'player_id'}] for the rest of the run."""
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        name_col, url_col = header.index('name'), header.index('dotabuff')
+        return [
+            # Names are only ever rendered into the report, so escape them once here
+            {'name': html.escape(row[name_col]),
+             'player_id': row[url_col].strip().rstrip('/').rsplit('/', 1)[-1]}
+            for row in reader if row
+        ]
+
+
+def fetch_cached(fn, url, params=None, refresh=False, max_age=None, project=None):
+    entry = cache.get(fn)
+    if entry and entry['data'] and not refresh and (
+            max_age is None or time.time() - entry['fetched_at'] <= max_age):
+        return entry['data']
+    # Revalidate what we already have instead of downloading it again
+    data, new_validators = make_api_request(url, params, entry)
+    if data is NOT_MODIFIED:
+        print(f"{fn} not modified on server")
+        entry['fetched_at'] = time.time()
+        return entry['data']
+    if data is None:
+        if entry:
+            print(f"Falling back to stale cached {fn}")
+            return entry['data']
         return None
+    if project:
+        data = project(data)
+    cache[fn] = {'fetched_at': time.time(), **new_validators, 'data': data}
+    return data
+
+
+def project_hero_records(data):
+    # Only these fields are used downstream; don't keep the rest of the payload around
+    return [{'hero_id': x['hero_id'], 'games': x['games'], 'win': x['win']} for x in data]
+
+
+def fetch_player_heroes(player_id, tf, days, refresh=False):
+    url = f"https://api.opendota.com/api/players/{player_id}/heroes"
+    params = {'date': days} if days else None
+    return fetch_cached(f"{player_id}_heroes_{tf}.json", url, params, refresh,
+                        max_age=PLAYER_HEROES_TTL.get(tf), project=project_hero_records) or []
 
 
 def main():
@@ -80,154 +424,91 @@ def main():
 
     load_api_key()
 
-    # Read players
-    players = []
-    with open(args.players_csv, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            pid = row['dotabuff'].rstrip('/').split('/')[-1]
-            players.append({'name': row['name'], 'player_id': pid})
+    players = read_players(args.players_csv)
+
+    cache.update(load_cached_data(CACHE_FILE) or {})
 
     # Load hero stats
-    heroes = load_cached_data('heroStats.json') if not args.refresh else None
-    if not heroes:
-        heroes = make_api_request('https://api.opendota.com/api/heroStats')
-        cache_data('heroStats.json', heroes)
-
-    # Mappings
-    id_to_local = {h['id']: h['localized_name'] for h in heroes}
-    id_to_key   = {h['id']: h['name'].replace('npc_dota_hero_', '') for h in heroes}
-    hero_list   = sorted(id_to_local.items(), key=lambda x: x[1])
-
-    TIME_FRAMES = {'all_time': None, 'last_2_years': 730, 'last_9_months': 270}
-
-    # Fetch per-player hero data
-    phs = {tf: {} for tf in TIME_FRAMES}
-    for p in players:
-        for tf, days in TIME_FRAMES.items():
-            fn = f"{p['player_id']}_heroes_{tf}.json"
-            data = None if args.refresh else load_cached_data(fn)
-            if not data:
-                url = f"https://api.opendota.com/api/players/{p['player_id']}/heroes"
-                params = {'date': days} if days else None
-                data = make_api_request(url, params)
-                cache_data(fn, data or [])
-            phs[tf][p['player_id']] = data or []
+    heroes = fetch_cached('heroStats.json', 'https://api.opendota.com/api/heroStats',
+                          refresh=args.refresh, max_age=HERO_STATS_TTL)
+
+    # Mappings (built in a single pass over the roster)
+    id_to_local, id_to_key = {}, {}
+    for h in heroes:
+        id_to_local[h['id']] = h['localized_name']
+        id_to_key[h['id']]   = h['name'].replace('npc_dota_hero_', '')
+    hero_list   = sorted(id_to_local.items(), key=itemgetter(1))
+    # (hero_id, escaped name, portrait URL) in report order, built once for the HTML pass
+    hero_assets = [(hid, html.escape(lname), HERO_IMG_URL.format(key=id_to_key[hid]))
+                   for hid, lname in hero_list]
+
+    # Fetch per-player hero data, indexed by hero_id and scored as each response lands
+    scored = {tf: {} for tf in TIME_FRAMES}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(fetch_player_heroes, p['player_id'], tf, days, args.refresh): (tf, p['player_id'])
+            for p in players for tf, (days, _) in TIME_FRAMES.items()
+        }
+        for fut in as_completed(futures):
+            tf, pid = futures[fut]
+            scored[tf][pid] = score_records(fut.result())
+    cache_data(CACHE_FILE, cache)
 
     # Compute scores
     hero_stats = {tf: {} for tf in TIME_FRAMES}
+    trophies = Counter()  # all_time podium points, tallied as each hero is ranked
+    # Rows are read-only once built, so every hero a player never picked shares one row
+    unplayed_rows = [{'name': p['name'], 'games': 0, 'wins': 0, 'winrate': 0, 'score': 0}
+                     for p in players]
     for tf in TIME_FRAMES:
+        player_scores = [(p, scored[tf][p['player_id']], row) for p, row in zip(players, unplayed_rows)]
         for hid, _ in hero_list:
-            stats = []
-            for p in players:
-                rec = next((x for x in phs[tf][p['player_id']] if x['hero_id']==hid), {})
-                w, g = rec.get('win', 0), rec.get('games', 0)
-                score = adjusted_score(w, g)
-                stats.append({
+            # Scores are never negative, so only the positive ones need sorting; the
+            # zero rows go last in CSV order, exactly where a stable sort leaves them
+            ranked, unranked = [], []
+            for p, by_hero, unplayed in player_scores:
+                rec = by_hero.get(hid)
+                if rec is None:
+                    unranked.append(unplayed)
+                    continue
+                g, w, winrate, score = rec
+                (ranked if score > 0 else unranked).append({
                     'name': p['name'],
                     'games': g,
                     'wins': w,
-                    'winrate': (w/g*100 if g>0 else 0),
+                    'winrate': winrate,
                     'score': score
                 })
-            stats.sort(key=lambda x: x['score'], reverse=True)
-            hero_stats[tf][hid] = stats
-
-    # Compute trophy points for all_time
-    trophies = {}
-    for hid, _ in hero_list:
-        top3 = hero_stats['all_time'][hid][:3]
-        for idx, entry in enumerate(top3):
-            pts = 3 - idx  # 3, 2, 1
-            trophies[entry['name']] = trophies.get(entry['name'], 0) + pts
-    sorted_trophies = sorted(trophies.items(), key=lambda x: x[1], reverse=True)
+            ranked.sort(key=itemgetter('score'), reverse=True)
+            ranked.extend(unranked)
+            hero_stats[tf][hid] = ranked
+            if tf == 'all_time':
+                for idx, entry in enumerate(ranked[:3]):
+                    trophies[entry['name']] += 3 - idx  # 3, 2, 1
+
+    sorted_trophies = trophies.most_common()
 
     # Generate HTML report
     report_time = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    with open(args.output, 'w', encoding='utf-8') as out:
-        # Header
-        out.write('<!DOCTYPE html>\n<html lang="en">\n<head>\n')
-        out.write('  <meta charset="UTF-8">\n')
-        out.write('  <meta name="viewport" content="width=device-width, initial-scale=1.0">\n')
-        out.write('  <title>Sealson Hero Report</title>\n')
-        # Styles
-        out.write('<style>\n')
-        out.write('body { font-family: Arial, sans-serif; margin: 0; padding: 20px; background-color: #1e1e1e; color: #f0f0f0; }\n')
-        out.write('.timeframe-container { margin-bottom: 20px; }\n')
-        out.write('.timeframe-container select { padding: 8px 12px; font-size: 1em; border-radius: 4px; background-color: #333; color: #f0f0f0; border: 1px solid #555; }\n')
-        out.write('.container { display: flex; flex-wrap: wrap; }\n')
-        out.write('.hero { width: 48%; box-sizing: border-box; padding: 10px; margin: 1%; border: 1px solid #444; border-radius: 4px; background-color: #2a2a2a; }\n')
-        out.write('.hero h2 { margin: 0 0 10px; }\n')
-        out.write('.hero img { display: block; margin: 0 auto 10px; width: 125px; }\n')
-        out.write('table { width: 100%; border-collapse: collapse; margin-bottom: 5px; table-layout: fixed; }\n')
-        out.write('th, td { border: 1px solid #555; padding: 6px; text-align: center; overflow: hidden; text-overflow: ellipsis; white-space: nowrap; }\n')
-        out.write('th { background-color: #333; cursor: pointer; }\n')
-        out.write('th:nth-child(1), td:nth-child(1) { width: 45%; }\n')
-        out.write('th:nth-child(2), td:nth-child(2), th:nth-child(3), td:nth-child(3) { width: 15%; }\n')
-        out.write('th:nth-child(4), td:nth-child(4), th:nth-child(5), td:nth-child(5) { width: 12.5%; }\n')
-        out.write('tr:nth-child(even) { background-color: #2e2e2e; }\n')
-        out.write('tr:nth-child(odd) { background-color: #262626; }\n')
-        out.write('tr.hidden { display: none; }\n')
-        out.write('button.toggle { display: block; margin: 5px auto; padding: 6px 12px; font-size: 0.9em; background: #444; color: #fff; border: none; border-radius: 3px; cursor: pointer; }\n')
-        out.write('button.toggle:hover { background: #555; }\n')
-        out.write('.tooltip { position: relative; display: inline-block; cursor: help; }\n')
-        out.write('.tooltip .tooltiptext { visibility: hidden; width: 220px; background-color: #333; color: #fff; text-align: center; border-radius: 4px; padding: 5px; position: absolute; z-index: 1; bottom: 125%; left: 50%; transform: translateX(-50%); opacity: 0; transition: opacity 0.3s; }\n')
-        out.write('.tooltip:hover .tooltiptext { visibility: visible; opacity: 1; }\n')
-        out.write('.trophies { margin: 40px auto; width: 50%; border-collapse: collapse; }\n')
-        out.write('.trophies th, .trophies td { border: 1px solid #555; padding: 6px; text-align: center; }\n')
-        out.write('.trophies th { background-color: #444; }\n')
-        out.write('</style>\n')
-        # Scripts
-        out.write('<script>\n')
-        out.write('document.addEventListener("DOMContentLoaded", ()=>{\n')
-        out.write('  const timeSelect = document.getElementById("timeFrameSelect");\n')
-        out.write('  function toggleTimeFrame(){ const tf=timeSelect.value; document.querySelectorAll(".hero").forEach(hero=>{hero.querySelectorAll("table").forEach(tbl=>tbl.style.display=tbl.classList.contains(tf)?"table":"none"); const btn=hero.querySelector("button.toggle"); btn.textContent="Show all"; hero.querySelectorAll(`table.${tf} tbody tr.hidden`).forEach(r=>r.style.display="none");});}\n')
-        out.write('  timeSelect.addEventListener("change",toggleTimeFrame);\n')
-        out.write('  document.querySelectorAll("button.toggle").forEach(btn=>btn.addEventListener("click",()=>{ const heroId=btn.dataset.hero; const tf=timeSelect.value; document.querySelectorAll(`#hero_${heroId} table.${tf} tbody tr.hidden`).forEach(r=>r.style.display=r.style.display==="none"?"table-row":"none"); btn.textContent=btn.textContent==="Show all"?"Show top 5":"Show all";}));\n')
-        out.write('  function sortTable(tbl,col,asc){ const tb=tbl.tBodies[0]; Array.from(tb.rows).sort((a,b)=>{ const A=a.cells[col].textContent.trim(),B=b.cells[col].textContent.trim(),nA=parseFloat(A),nB=parseFloat(B); if(!isNaN(nA)&&!isNaN(nB))return asc?nA-nB:nB-nA; return asc?A.localeCompare(B):B.localeCompare(A); }).forEach(r=>tb.appendChild(r));}\n')
-        out.write('  document.querySelectorAll("table").forEach(tbl=>Array.from(tbl.tHead.rows[0].cells).forEach((th,i)=>{let asc=true;th.addEventListener("click",()=>{sortTable(tbl,i,asc);asc=!asc;});}));\n')
-        out.write('  toggleTimeFrame();\n')
-        out.write('});\n')
-        out.write('</script>\n')
-        out.write('</head>\n<body>\n')
+    # Stream through a large buffer instead of building the page in memory; the temp
+    # file is swapped in at the end so a failed run never leaves half a report
+    tmp_output = args.output + '.tmp'
+    with open(tmp_output, 'w', encoding='utf-8', newline='', buffering=WRITE_BUFFER) as out:
+        out.write(REPORT_HEAD)
         out.write(f'<h1>Sealson 0 Hero Report</h1><p>Generated: {report_time}</p>\n')
-        # Timeframe selector
-        out.write('<div class="timeframe-container"><label for="timeFrameSelect">Time Frame:</label>')
-        out.write('<select id="timeFrameSelect">\n')
-        out.write('<option value="all_time">All Time</option>\n')
-        out.write('<option value="last_2_years">Last 2 Years</option>\n')
-        out.write('<option value="last_9_months">Last 9 Months</option>\n')
-        out.write('</select></div>\n')
-        # Hero sections
-        out.write('<div class="container">\n')
-        for hid,lname in hero_list:
-            img=id_to_key[hid]
-            out.write(f'<div class="hero" id="hero_{hid}">\n')
-            out.write(f'<h2>{lname}</h2>\n')
-            out.write(f'<img src="https://cdn.cloudflare.steamstatic.com/apps/dota2/images/dota_react/heroes/{img}.png" alt="{lname}">\n')
-            out.write(f'<button class="toggle" data-hero="{hid}">Show all</button>\n')
-            for tf in TIME_FRAMES:
-                stats=hero_stats[tf][hid]
-                top5,rest=stats[:5],stats[5:]
-                out.write(f'<table class="{tf}">\n<thead><tr><th>Player</th><th>Games</th><th>Wins</th><th>Win Rate</th><th>Score</th></tr></thead>\n<tbody>\n')
-                for p in top5:
-                    out.write(f'<tr><td>{p["name"]}</td><td>{p["games"]}</td><td>{p["wins"]}</td><td>{p["winrate"]:.2f}%</td><td>{p["score"]:.4f}</td></tr>\n')
-                for p in rest:
-                    out.write(f'<tr class="hidden"><td>{p["name"]}</td><td>{p["games"]}</td><td>{p["wins"]}</td><td>{p["winrate"]:.2f}%</td><td>{p["score"]:.4f}</td></tr>\n')
-                out.write('</tbody>\n</table>\n')
-            out.write('</div>\n')
-        out.write('</div>\n')
-        # Trophies summary with CSS tooltip
-        out.write('<h2 style="text-align:center; margin-top:40px;">Top 5 Trophy Leaders ')
-        out.write('<span class="tooltip">?')
-        out.write('<span class="tooltiptext">Trophy points: 3 for 1st, 2 for 2nd, 1 for 3rd on each hero.</span>')
-        out.write('</span></h2>\n')
-        out.write('<table class="trophies">\n<thead><tr><th>Player</th><th>Trophy Points</th></tr></thead>\n<tbody>\n')
-        for name,pts in sorted_trophies[:5]:
-            out.write(f'<tr><td>{name}</td><td>{pts}</td></tr>\n')
-        out.write('</tbody>\n</table>\n')
+        out.write(TIME_FRAME_SELECT)
+        # Hero sections, then the trophies summary with CSS tooltip
+        out.writelines(chain(
+            ['<div class="container">\n'],
+            chain.from_iterable(
+                emit_hero_section(hid, lname, img_url, hero_stats) for hid, lname, img_url in hero_assets
+            ),
+            ['</div>\n'],
+            emit_trophies(sorted_trophies),
+        ))
         # Footer
         out.write('</body>\n</html>')
+    os.replace(tmp_output, args.output)
     print(f"Report written to {args.output}")
 
 if __name__=='__main__':
@@ -13,6 +13,8 @@ Label Ability Roles (carry / support / both) from HS cache.
       ...
     }
   }
+- Appends each change to cache/ability_roles.log between full saves,
+  and replays it on the next start if the session didn't exit cleanly
 
 Controls:
   c = carry, s = support, b = both
@@ -20,6 +22,7 @@ Controls:
 """
 
 import json
+import os
 import sys
 import time
 import random
@@ -27,18 +30,24 @@ import shutil
 from pathlib import Path
 from typing import Dict, List, Tuple, Optional
 
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
 CACHE_DIR = Path("cache")
 HS_FILE   = CACHE_DIR / "ability_high_skill.json"
 OUT_FILE  = CACHE_DIR / "ability_roles.json"
+LOG_FILE  = CACHE_DIR / "ability_roles.log"
 BACKUP_DIR = CACHE_DIR / "backups"
 
-AUTOSAVE_EVERY = 10  # write file every N labels, plus on quit
+AUTOSAVE_SECONDS = 60  # rewrite OUT_FILE at most this often, plus on quit; LOG_FILE covers the gap
+MAX_BACKUPS = 20     # newest snapshots kept in BACKUP_DIR
 
 def load_hs() -> Tuple[Dict, Dict[str, dict]]:
     if not HS_FILE.exists():
         raise SystemExit(f"Missing {HS_FILE}. Run the scraper first.")
-    with HS_FILE.open("r", encoding="utf-8") as f:
-        doc = json.load(f)
+    doc = (orjson or json).loads(HS_FILE.read_bytes())
     data = doc.get("data", {})
     abilities = {}
     for name, row in data.items():
@@ -51,27 +60,63 @@ def load_hs() -> Tuple[Dict, Dict[str, dict]]:
 
 def load_labels() -> Dict:
     if OUT_FILE.exists():
-        with OUT_FILE.open("r", encoding="utf-8") as f:
-            try:
-                doc = json.load(f)
-                if isinstance(doc, dict) and "labels" in doc:
-                    return doc
-            except Exception:
-                pass
+        try:
+            doc = (orjson or json).loads(OUT_FILE.read_bytes())
+            if isinstance(doc, dict) and "labels" in doc:
+                return doc
+        except Exception:
+            pass
     return {"meta": {}, "labels": {}}
 
 def save_labels(payload: Dict, do_backup: bool = True):
     OUT_FILE.parent.mkdir(parents=True, exist_ok=True)
     tmp = OUT_FILE.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(payload, f, ensure_ascii=False, indent=2)
+    if orjson:
+        raw = orjson.dumps(payload, option=orjson.OPT_INDENT_2)
+    else:
+        raw = json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp.write_bytes(raw)
     tmp.replace(OUT_FILE)
+    # Everything in the log is in OUT_FILE now
+    LOG_FILE.unlink(missing_ok=True)
 
     if do_backup:
         BACKUP_DIR.mkdir(parents=True, exist_ok=True)
         ts = time.strftime("%Y%m%d-%H%M%S", time.localtime())
         bpath = BACKUP_DIR / f"ability_roles_{ts}.json"
-        shutil.copy2(OUT_FILE, bpath)
+        # OUT_FILE was just swapped in as a fresh inode, so a hardlink is a safe snapshot
+        try:
+            os.link(OUT_FILE, bpath)
+        except OSError:  # no hardlinks here, or a snapshot from this same second
+            shutil.copy2(OUT_FILE, bpath)
+        for old in sorted(BACKUP_DIR.glob("ability_roles_*.json"))[:-MAX_BACKUPS]:
+            old.unlink()
+
+def append_log(name: str, label: Optional[str]):
+    """Durably record one change (label None = removed) without rewriting OUT_FILE."""
+    entry = {"t": time.time(), "n": name, "l": label}
+    line = orjson.dumps(entry) if orjson else json.dumps(entry, ensure_ascii=False).encode("utf-8")
+    with LOG_FILE.open("ab") as f:
+        f.write(line + b"\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+def replay_log(labels: Dict[str, str]) -> int:
+    """Apply changes logged after the last full save; returns how many were replayed."""
+    if not LOG_FILE.exists():
+        return 0
+    replayed = 0
+    for line in LOG_FILE.read_bytes().splitlines():
+        try:
+            entry = (orjson or json).loads(line)
+        except Exception:
+            break  # torn final write from a crash
+        if entry["l"] is None:
+            labels.pop(entry["n"], None)
+        else:
+            labels[entry["n"]] = entry["l"]
+        replayed += 1
+    return replayed
 
 def fmt_pct(v):
     return f"{v:.2f}%" if isinstance(v, (int, float)) else "—"
@@ -121,6 +166,9 @@ def main():
     hs_meta, abilities = load_hs()
     payload = load_labels()
     labels = payload.setdefault("labels", {})
+    replayed = replay_log(labels)
+    if replayed:
+        print(f"Recovered {replayed} unsaved change(s) from {LOG_FILE}")
     payload["meta"] = {
         "source": hs_meta.get("source"),
         "hs_cached_at": hs_meta.get("cached_at"),
@@ -136,6 +184,7 @@ def main():
 
     history: List[Tuple[str, Optional[str]]] = []  # (ability, previous_label or None)
     made = 0
+    last_save = time.monotonic()
 
     idx = 0
     while idx < len(queue):
@@ -169,6 +218,7 @@ def main():
                     labels.pop(last_name, None)
                 else:
                     labels[last_name] = prev
+                append_log(last_name, prev)
                 payload["meta"]["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
                 print(f"Undid: {last_name} -> {prev}")
             else:
@@ -190,10 +240,12 @@ def main():
         if prev != new_label:
             history.append((name, prev))
             labels[name] = new_label  # type: ignore[assignment]
+            append_log(name, new_label)
             payload["meta"]["updated_at"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
             made += 1
-            if made % AUTOSAVE_EVERY == 0:
+            if time.monotonic() - last_save >= AUTOSAVE_SECONDS:
                 save_labels(payload, do_backup=True)
+                last_save = time.monotonic()
                 print(f"(autosaved after {made} changes)")
         idx += 1
 
@@ -1,24 +1,114 @@
 import requests
 import csv
+import email.utils
 import os
 import time
-import shutil
+import random
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import argparse
 import re
 import json
-from datetime import datetime, timedelta
 import math  # Import math module for entropy calculation
+from requests.adapters import HTTPAdapter
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
 
 CACHE_DIR = 'cache'
-REQUEST_DELAY = 1  # seconds
+# seconds a cached player file is used before it is revalidated; PLAYER_STATS_CACHE_TTL overrides
+CACHE_TTL = int(os.environ.get('PLAYER_STATS_CACHE_TTL', 24 * 3600))
+RATE_LIMIT = 60  # requests per RATE_PERIOD (OpenDota's free tier)
+RATE_PERIOD = 60  # seconds
+REQUEST_TIMEOUT = (5, 30)  # seconds: connect, read
+MAX_WORKERS = 8  # concurrent OpenDota requests
+MAX_ATTEMPTS = 6  # per request, when rate limited
+WRITE_BUFFER = 1 << 20  # bytes buffered before the report is flushed to disk
 API_KEY = None  # Will be loaded from opendota.properties
 
+# One keep-alive connection pool for every OpenDota call instead of a handshake per request
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=MAX_WORKERS, max_retries=0))
+
+# Account ID in a Dotabuff player URL, compiled once for every CSV row
+PLAYER_ID_RE = re.compile(r'/players/(\d+)')
+
+# OpenDota's lane_role keys in counts data, one per position
+LANE_ROLE_IDS = ('1', '2', '3', '4', '5')
+MAX_ROLE_ENTROPY = math.log2(len(LANE_ROLE_IDS))  # every role played equally
+
+# Report columns after the player name, in table order
+METRICS = (
+    'games_played', 'overall_winrate', 'winrate_excl_top20', 'discomfort_factor',
+    'versatility_factor', 'role_diversity_factor', 'aggregated_value',
+)
+# Row for a time frame that could not be computed
+NA_METRICS = dict.fromkeys(METRICS, 'N/A')
+
+# Per-player endpoints fetched for every time frame -> what to call them in errors
+ENDPOINTS = {
+    'wl': 'win/loss data',
+    'heroes': 'hero stats',
+    'counts': 'counts data',
+}
+endpoint_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+# Separate pool for whole (player, time frame) loads: their threads block on endpoint_pool,
+# so sharing one pool could leave every worker waiting on work that never gets a thread
+player_pool = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+player_data_memo = {}  # (account_id, days) -> player data already loaded this run
+
+# Games on a hero before it counts as comfortable, per time frame
+DISCOMFORT_THRESHOLDS = {
+    'all_time': 40,
+    'last_2_years': 24,
+    'last_9_months': 9,
+}
+
+# name -> days of history passed to the API (None for all time)
 TIME_FRAMES = {
     'all_time': None,
-    'last_2_years': (datetime.now() - timedelta(days=730)).strftime('%Y-%m-%d'),
-    'last_9_months': (datetime.now() - timedelta(days=270)).strftime('%Y-%m-%d'),
+    'last_2_years': 730,
+    'last_9_months': 270,
 }
 
+class RateLimiter:
+    """At most `calls` requests in any trailing `period` seconds.
+
+    The budget adapts to the server: halved on every 429, then grown back by one per
+    successful call up to the configured limit.
+    """
+
+    def __init__(self, calls, period):
+        self.calls = self.max_calls = calls
+        self.period = period
+        self.stamps = deque()  # monotonic send times inside the current window
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                while self.stamps and now - self.stamps[0] >= self.period:
+                    self.stamps.popleft()
+                if len(self.stamps) < self.calls:
+                    self.stamps.append(now)
+                    return
+                wait = self.period - (now - self.stamps[0])
+            time.sleep(wait)
+
+    def throttle(self):
+        with self.lock:
+            self.calls = max(1, self.calls // 2)
+
+    def recover(self):
+        with self.lock:
+            self.calls = min(self.max_calls, self.calls + 1)
+
+rate_limiter = RateLimiter(RATE_LIMIT, RATE_PERIOD)
+
 def load_api_key():
     global API_KEY
     properties_file = 'opendota.properties'
@@ -32,75 +122,123 @@ def load_api_key():
     else:
         print("opendota.properties file not found. Continuing without API key.")
 
-def make_api_request(url, params=None):
+def retry_delay(response, attempt):
+    """Seconds to wait after a 429: the server's Retry-After, else jittered backoff."""
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                when = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, when.timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return min(60, 0.5 * 2**attempt) + random.random()
+
+def make_api_request(url, params=None, headers=None):
     # Append the API key to the params if it's available
     if API_KEY:
         if params is None:
             params = {}
         params['api_key'] = API_KEY
-    try:
-        response = requests.get(url, params=params)
-        if response.status_code == 429:
-            print("Rate limit exceeded. Sleeping for 60 seconds.")
-            time.sleep(60)
-            return make_api_request(url, params)
-        else:
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            rate_limiter.acquire()
+            response = SESSION.get(url, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
+        except requests.exceptions.RequestException as e:
+            print(f"Request failed: {e}")
+            return None
+        if response.status_code != 429:
+            rate_limiter.recover()
             return response
-    except requests.exceptions.RequestException as e:
-        print(f"Request failed: {e}")
-        return None
-
-def fetch_player_data(account_id, date_range, refresh=False):
-    cache_filename = os.path.join(CACHE_DIR, f"{account_id}_{date_range if date_range else 'all'}.json")
-
-    if not os.path.exists(CACHE_DIR):
-        os.makedirs(CACHE_DIR)
-
-    if not refresh and os.path.exists(cache_filename):
-        with open(cache_filename, 'r', encoding='utf-8') as cache_file:
-            print(f"Using cached data for account ID {account_id} and date range {date_range if date_range else 'all'}")
-            return json.load(cache_file)
+        # Only this thread waits; the others keep going under the halved budget
+        rate_limiter.throttle()
+        delay = retry_delay(response, attempt)
+        print(f"Rate limit exceeded. Retrying in {delay:.1f} seconds.")
+        time.sleep(delay)
+    print(f"Giving up on {url} after {MAX_ATTEMPTS} rate-limited attempts")
+    return None
+
+def fetch_endpoint(url, params, cached, name):
+    """Conditional GET of one endpoint; returns (data, validators), reusing cached[name] on a 304."""
+    validators = cached.get('validators', {}).get(name, {})
+    headers = {}
+    if validators.get('etag'):
+        headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'):
+        headers['If-Modified-Since'] = validators['last_modified']
+    response = make_api_request(url, params, headers)
+    if not response:
+        return None, None
+    if response.status_code == 304 and name in cached:
+        return cached[name], validators
+    if response.status_code != 200:
+        return None, None
+    return (orjson or json).loads(response.content), {'etag': response.headers.get('ETag'),
+                             'last_modified': response.headers.get('Last-Modified')}
+
+def fetch_player_data(account_id, days, refresh=False):
+    # Anything already loaded or fetched this run is current, even under --refresh
+    key = (account_id, days)
+    if key not in player_data_memo:
+        player_data = load_player_data(account_id, days, refresh)
+        if player_data is None:
+            return None
+        player_data_memo[key] = player_data
+    return player_data_memo[key]
+
+def load_player_data(account_id, days, refresh=False):
+    # Keyed by the window length, not its start date, so the file survives past midnight
+    cache_filename = os.path.join(CACHE_DIR, f"{account_id}_{days if days else 'all'}.json")
+
+    # Open directly instead of stat'ing first; the age comes from the open handle
+    cached = {}
+    try:
+        with open(cache_filename, 'rb') as cache_file:
+            age = time.time() - os.fstat(cache_file.fileno()).st_mtime
+            cached = (orjson or json).loads(cache_file.read())
+    except FileNotFoundError:
+        pass
+    else:
+        # Past the TTL the copy is revalidated with conditional GETs rather than trusted
+        if not refresh and age < CACHE_TTL:
+            print(f"Using cached data for account ID {account_id} and date range {f'last {days} days' if days else 'all'}")
+            return cached
 
     params = {}
-    if date_range:
-        days = (datetime.now() - datetime.strptime(date_range, '%Y-%m-%d')).days
+    if days:
         params['date'] = days
 
-    # Fetch win/loss data
-    wl_url = f'https://api.opendota.com/api/players/{account_id}/wl'
-    time.sleep(REQUEST_DELAY)
-    wl_response = make_api_request(wl_url, params)
-    if not wl_response or wl_response.status_code != 200:
-        print(f"Failed to fetch win/loss data for account ID {account_id}.")
-        return None
-    wl_data = wl_response.json()
-
-    # Fetch hero stats
-    heroes_url = f'https://api.opendota.com/api/players/{account_id}/heroes'
-    time.sleep(REQUEST_DELAY)
-    heroes_response = make_api_request(heroes_url, params)
-    if not heroes_response or heroes_response.status_code != 200:
-        print(f"Failed to fetch hero stats for account ID {account_id}.")
-        return None
-    heroes_data = heroes_response.json()
-
-    # Fetch role counts
-    counts_url = f'https://api.opendota.com/api/players/{account_id}/counts'
-    time.sleep(REQUEST_DELAY)
-    counts_response = make_api_request(counts_url, params)
-    if not counts_response or counts_response.status_code != 200:
-        print(f"Failed to fetch counts data for account ID {account_id}.")
-        return None
-    counts_data = counts_response.json()
-
-    player_data = {
-        'wl': wl_data,
-        'heroes': heroes_data,
-        'counts': counts_data,
-    }
-
-    with open(cache_filename, 'w', encoding='utf-8') as cache_file:
-        json.dump(player_data, cache_file)
+    # The endpoints are independent, so request them side by side
+    base_url = f'https://api.opendota.com/api/players/{account_id}/'
+    futures = {name: endpoint_pool.submit(fetch_endpoint, base_url + name, dict(params), cached, name)
+               for name in ENDPOINTS}
+    player_data, validators = {}, {}
+    for name, what in ENDPOINTS.items():
+        data, validators[name] = futures[name].result()
+        if data is None:
+            print(f"Failed to fetch {what} for account ID {account_id}.")
+            if all(section in cached for section in ENDPOINTS):
+                # Outage or offline: an old copy still beats an all-N/A row
+                print(f"Using stale cache for account ID {account_id} and date range {f'last {days} days' if days else 'all'}")
+                return cached
+            return None
+        player_data[name] = data
+    # ETag/Last-Modified per endpoint, sent back as a conditional GET on --refresh
+    player_data['validators'] = validators
+
+    if all(player_data[name] is cached.get(name) for name in ENDPOINTS):
+        # Every endpoint answered 304: the file is already right, just restart its TTL
+        os.utime(cache_filename)
+        return cached
+
+    raw = orjson.dumps(player_data) if orjson else json.dumps(player_data).encode('utf-8')
+    # Write beside the real file and swap it in, so a crash never leaves a truncated cache
+    tmp_filename = cache_filename + '.tmp'
+    with open(tmp_filename, 'wb') as cache_file:
+        cache_file.write(raw)
+    os.replace(tmp_filename, cache_filename)
 
     return player_data
 
@@ -112,45 +250,49 @@ def calculate_overall_winrate(wl_data):
         return 0.0
     return (wins / total_games) * 100
 
-def calculate_winrate_excluding_top_20(hero_stats):
-    top_20_heroes = hero_stats[:20]
-    games_in_top_20 = sum(hero['games'] for hero in top_20_heroes)
-    wins_in_top_20 = sum(hero['win'] for hero in top_20_heroes)
-
-    total_games = sum(hero['games'] for hero in hero_stats)
-    total_wins = sum(hero['win'] for hero in hero_stats)
-
-    games_excl_top_20 = total_games - games_in_top_20
-    wins_excl_top_20 = total_wins - wins_in_top_20
-
+def calculate_winrate_excluding_top_20(games_excl_top_20, wins_excl_top_20):
     if games_excl_top_20 == 0:
         return 'N/A'  # Cannot calculate winrate if no games outside top 20 heroes
     else:
         return (wins_excl_top_20 / games_excl_top_20) * 100
 
-def calculate_discomfort_factor(hero_stats, time_frame_name):
-    # Get the threshold for the time frame
-    if time_frame_name == 'all_time':
-        threshold = 40
-    elif time_frame_name == 'last_2_years':
-        threshold = 24
-    elif time_frame_name == 'last_9_months':
-        threshold = 9
-    else:
-        threshold = 0  # Should not occur
+def compute_hero_metrics(hero_stats, time_frame_name):
+    """Every hero_stats-based metric from one pass over the list.
 
-    # Separate heroes into comfy and uncomfy
-    comfy_heroes = [hero for hero in hero_stats if hero['games'] >= threshold]
-    uncomfy_heroes = [hero for hero in hero_stats if 0 < hero['games'] < threshold]
-
-    # Calculate comfy winrate
-    comfy_games = sum(hero['games'] for hero in comfy_heroes)
-    comfy_wins = sum(hero['win'] for hero in comfy_heroes)
+    Returns (total_games_played, winrate_excl_top20, discomfort_factor, versatility_factor).
+    """
+    # Get the threshold for the time frame
+    threshold = DISCOMFORT_THRESHOLDS.get(time_frame_name, 0)  # 0 should not occur
+
+    # Comfy heroes have >= threshold games, uncomfy ones fewer but some. OpenDota lists
+    # heroes most-played first, so everything past index 20 is "the rest" for the top-20 winrate
+    comfy_games = comfy_wins = uncomfy_games = uncomfy_wins = heroes_played = 0
+    games_excl_top_20 = wins_excl_top_20 = 0
+    for index, hero in enumerate(hero_stats):
+        games = hero['games']
+        if games <= 0:
+            continue
+        wins = hero['win']
+        heroes_played += 1
+        if games >= threshold:
+            comfy_games += games
+            comfy_wins += wins
+        else:
+            uncomfy_games += games
+            uncomfy_wins += wins
+        if index >= 20:
+            games_excl_top_20 += games
+            wins_excl_top_20 += wins
+
+    return (
+        comfy_games + uncomfy_games,
+        calculate_winrate_excluding_top_20(games_excl_top_20, wins_excl_top_20),
+        calculate_discomfort_factor(comfy_games, comfy_wins, uncomfy_games, uncomfy_wins),
+        calculate_versatility_factor(heroes_played),
+    )
+
+def calculate_discomfort_factor(comfy_games, comfy_wins, uncomfy_games, uncomfy_wins):
     comfy_winrate = (comfy_wins / comfy_games) if comfy_games > 0 else None
-
-    # Calculate uncomfy winrate
-    uncomfy_games = sum(hero['games'] for hero in uncomfy_heroes)
-    uncomfy_wins = sum(hero['win'] for hero in uncomfy_heroes)
     uncomfy_winrate = (uncomfy_wins / uncomfy_games) if uncomfy_games > 0 else None
 
     # Handle cases where we cannot compute the discomfort factor
@@ -167,338 +309,337 @@ def calculate_discomfort_factor(hero_stats, time_frame_name):
 
     return discomfort_factor
 
-def calculate_versatility_factor(hero_stats):
-    num_heroes_played = len([hero for hero in hero_stats if hero['games'] > 0])
+def calculate_versatility_factor(num_heroes_played):
     versatility_factor = (num_heroes_played / 123) * 100  # Assuming 123 heroes in Dota 2
     return versatility_factor
 
 def calculate_role_diversity(counts_data):
     # Roles are represented by integers 1 to 5 in OpenDota API
     role_counts = counts_data.get('lane_role', {})
-    total_games = 0
-    role_game_counts = {}
-    for role_id in ['1', '2', '3', '4', '5']:
-        role_data = role_counts.get(role_id, {})
-        games_played = role_data.get('games', 0) if isinstance(role_data, dict) else role_data if isinstance(role_data, int) else 0
-        role_game_counts[role_id] = games_played
-        total_games += games_played
+    role_game_counts = []
+    for role_id in LANE_ROLE_IDS:
+        role_data = role_counts.get(role_id, 0)
+        # Entries are normally {'games': n, ...}; older payloads carry the bare count
+        kind = type(role_data)
+        games_played = role_data.get('games', 0) if kind is dict else role_data if kind is int else 0
+        if games_played > 0:
+            role_game_counts.append(games_played)
+    total_games = sum(role_game_counts)
 
     if total_games == 0:
         return 0.0
 
-    entropy = 0.0
-    for games_played in role_game_counts.values():
-        if games_played > 0:
-            p_i = games_played / total_games
-            entropy -= p_i * math.log2(p_i)
-
-    max_entropy = math.log2(5)  # There are 5 roles
+    # fsum keeps the five-term sum exact; log2 bound locally for the generator
+    log2 = math.log2
+    entropy = math.fsum(-p_i * log2(p_i) for p_i in (games_played / total_games for games_played in role_game_counts))
 
     # Normalize entropy to a percentage
-    role_diversity_factor = (entropy / max_entropy) * 100
+    role_diversity_factor = (entropy / MAX_ROLE_ENTROPY) * 100
 
     return round(role_diversity_factor, 2)
 
 def calculate_aggregated_value(data):
-    try:
-        overall_winrate = float(data['overall_winrate'])
-        winrate_excl_top20 = float(data['winrate_excl_top20']) if data['winrate_excl_top20'] != 'N/A' else 0
-        discomfort_factor = float(data['discomfort_factor'])
-        versatility_factor = float(data['versatility_factor'])
-        role_diversity_factor = float(data['role_diversity_factor'])
-
-        aggregated_value = (
-            overall_winrate +
-            winrate_excl_top20 * 2 +
-            discomfort_factor * 2 +
-            versatility_factor * 2 +
-            role_diversity_factor
-        ) / 8
-
-        aggregated_value = round(aggregated_value, 2)
-        return aggregated_value
-    except (ValueError, ZeroDivisionError):
-        return 'N/A'
+    # Every input is a number by now (only winrate_excl_top20 can be 'N/A'), and the
+    # divisor is a constant, so there is nothing for a try/except to catch
+    winrate_excl_top20 = data['winrate_excl_top20']
+    aggregated_value = (
+        data['overall_winrate'] +
+        (winrate_excl_top20 * 2 if winrate_excl_top20 != 'N/A' else 0) +
+        data['discomfort_factor'] * 2 +
+        data['versatility_factor'] * 2 +
+        data['role_diversity_factor']
+    ) / 8
+
+    return round(aggregated_value, 2)
 
 def extract_player_id(dotabuff_url):
-    match = re.search(r'/players/(\d+)', dotabuff_url)
+    match = PLAYER_ID_RE.search(dotabuff_url)
     if match:
         return match.group(1)
     else:
         print(f"Error: Could not extract player ID from URL '{dotabuff_url}'. Please ensure it is a valid Dotabuff player URL.")
         return None
 
-def process_players(input_csv, output_html, refresh=False):
+def read_players(input_csv):
+    """(name, dotabuff_url) per CSV row; columns are looked up once from the header."""
     with open(input_csv, 'r', newline='', encoding='utf-8') as csv_in:
+        reader = csv.reader(csv_in)
+        header = next(reader, [])
+        name_col, url_col = header.index('name'), header.index('dotabuff')
+        return [(row[name_col], row[url_col]) for row in reader if row]
 
-        reader = csv.DictReader(csv_in)
-        players_data = {}
+def process_players(input_csv, output_html, refresh=False):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    players_data = {}
+    valid = []  # (player_info, player_id) for rows whose URL yielded an ID
+    fetches = {}
+
+    for name, dotabuff_url in read_players(input_csv):
+        player_info = players_data[name] = {
+            'name': name,
+            'dotabuff_url': dotabuff_url,
+            'data': {}
+        }
+        player_id = extract_player_id(dotabuff_url)
+        if player_id is None:
+            # If player ID couldn't be extracted, write 'N/A' and continue
+            for time_frame in TIME_FRAMES.keys():
+                player_info['data'][time_frame] = dict(NA_METRICS)
+            continue
+        valid.append((player_info, player_id))
+        # Start every player's loads up front; the shared rate limiter paces the requests
+        for days in TIME_FRAMES.values():
+            key = (player_id, days)
+            if key not in fetches:
+                fetches[key] = player_pool.submit(fetch_player_data, player_id, days, refresh=refresh)
+
+    for player_info, player_id in valid:
+        print(f"Processing player: {player_info['name']} (ID: {player_id})")
+
+        for time_frame_name, days in TIME_FRAMES.items():
+            print(f"  Time frame: {time_frame_name}")
+            player_data = fetches[(player_id, days)].result()
+            if player_data is not None:
+                wl_data = player_data['wl']
+                hero_stats = player_data['heroes']
+                counts_data = player_data['counts']
+
+                total_games_played, winrate_excl_top20, discomfort_factor, versatility_factor = \
+                    compute_hero_metrics(hero_stats, time_frame_name)
+                overall_winrate = calculate_overall_winrate(wl_data)
+                role_diversity_factor = calculate_role_diversity(counts_data)
+
+                data_dict = {
+                    'games_played': total_games_played,
+                    # Kept as numbers at the displayed precision; formatted only when written
+                    'overall_winrate': round(overall_winrate, 2),
+                    'winrate_excl_top20': round(winrate_excl_top20, 2) if winrate_excl_top20 != 'N/A' else 'N/A',
+                    'discomfort_factor': round(discomfort_factor, 2),
+                    'versatility_factor': round(versatility_factor, 2),
+                    'role_diversity_factor': round(role_diversity_factor, 2),
+                }
 
-        for row in reader:
-            name = row['name']
-            dotabuff_url = row['dotabuff']
+                aggregated_value = calculate_aggregated_value(data_dict)
+                data_dict['aggregated_value'] = aggregated_value
 
-            player_id = extract_player_id(dotabuff_url)
-            if player_id is None:
-                # If player ID couldn't be extracted, write 'N/A' and continue
-                player_info = {
-                    'name': name,
-                    'dotabuff_url': dotabuff_url,
-                    'data': {}
-                }
-                for time_frame in TIME_FRAMES.keys():
-                    player_info['data'][time_frame] = {
-                        'games_played': 'N/A',
-                        'overall_winrate': 'N/A',
-                        'winrate_excl_top20': 'N/A',
-                        'discomfort_factor': 'N/A',
-                        'versatility_factor': 'N/A',
-                        'role_diversity_factor': 'N/A',
-                        'aggregated_value': 'N/A'
-                    }
-                players_data[name] = player_info
-                continue
-
-            print(f"Processing player: {name} (ID: {player_id})")
-
-            player_info = {
-                'name': name,
-                'dotabuff_url': dotabuff_url,
-                'data': {}
-            }
-
-            for time_frame_name, date_range in TIME_FRAMES.items():
-                print(f"  Time frame: {time_frame_name}")
-                player_data = fetch_player_data(player_id, date_range, refresh=refresh)
-                if player_data is not None:
-                    wl_data = player_data['wl']
-                    hero_stats = player_data['heroes']
-                    counts_data = player_data['counts']
-
-                    total_games_played = sum(hero['games'] for hero in hero_stats)
-
-                    overall_winrate = calculate_overall_winrate(wl_data)
-                    winrate_excl_top20 = calculate_winrate_excluding_top_20(hero_stats)
-                    discomfort_factor = calculate_discomfort_factor(hero_stats, time_frame_name)
-                    versatility_factor = calculate_versatility_factor(hero_stats)
-                    role_diversity_factor = calculate_role_diversity(counts_data)
-
-                    data_dict = {
-                        'games_played': total_games_played,
-                        'overall_winrate': f"{overall_winrate:.2f}",
-                        'winrate_excl_top20': f"{winrate_excl_top20:.2f}" if winrate_excl_top20 != 'N/A' else 'N/A',
-                        'discomfort_factor': f"{discomfort_factor:.2f}",
-                        'versatility_factor': f"{versatility_factor:.2f}",
-                        'role_diversity_factor': f"{role_diversity_factor:.2f}",
-                    }
-
-                    aggregated_value = calculate_aggregated_value(data_dict)
-                    data_dict['aggregated_value'] = aggregated_value
-
-                    player_info['data'][time_frame_name] = data_dict
-                else:
-                    player_info['data'][time_frame_name] = {
-                        'games_played': 'N/A',
-                        'overall_winrate': 'N/A',
-                        'winrate_excl_top20': 'N/A',
-                        'discomfort_factor': 'N/A',
-                        'versatility_factor': 'N/A',
-                        'role_diversity_factor': 'N/A',
-                        'aggregated_value': 'N/A',
-                    }
-            players_data[name] = player_info
+                player_info['data'][time_frame_name] = data_dict
+            else:
+                player_info['data'][time_frame_name] = dict(NA_METRICS)
 
     generate_html_report(players_data, output_html)
     print(f"HTML report generated at {output_html}")
 
+# Red-to-green cell colors, one step per degree of hue. A cell is coloured at its nearest
+# step, so near a rounding edge it can be a degree or 1% off the exact-value colour
+GRADIENT_STEPS = 90
+GRADIENT = [
+    f'hsl({30 + 90 * n:.0f}, {50 + 10 * n:.0f}%, {25 + 10 * n:.0f}%)'
+    for n in (step / GRADIENT_STEPS for step in range(GRADIENT_STEPS + 1))
+]
+
+# Static <head> (styles, sorting/time-frame scripts) and the time frame selector
+REPORT_HEAD = """\
+<html><head><title>SEAL Player Report</title>
+<style>
+body { font-family: Arial, sans-serif; background-color: #1e1e1e; color: #f0f0f0; }
+table { border-collapse: collapse; width: 80%; margin: 20px auto; }
+th, td { border: 1px solid #555; padding: 8px; text-align: center; }
+th { background-color: #333; color: #f0f0f0; cursor: pointer; position: relative; }
+tr:nth-child(even) { background-color: #2e2e2e; }
+tr:nth-child(odd) { background-color: #262626; }
+td.name-column {
+  background-color: #dcdcdc;
+}
+td.name-column a {
+  color: #1e90ff;
+  text-decoration: none;
+}
+td.name-column a:hover {
+  text-decoration: underline;
+}
+.tooltip {
+  position: relative;
+  display: inline-block;
+}
+.tooltip .tooltiptext {
+  visibility: hidden;
+  width: 250px;
+  background-color: #555;
+  color: #fff;
+  text-align: center;
+  border-radius: 6px;
+  padding: 5px;
+  position: absolute;
+  z-index: 1;
+  bottom: 125%;
+  left: 50%;
+  margin-left: -125px;
+  opacity: 0;
+  transition: opacity 0.3s;
+}
+.tooltip:hover .tooltiptext {
+  visibility: visible;
+  opacity: 1;
+}
+</style>
+<script>
+function sortTable(table, col, reverse) {
+    let tb = table.tBodies[0],
+        tr = Array.prototype.slice.call(tb.rows, 0),
+        i;
+    reverse = -((+reverse) || -1);
+    tr = tr.sort(function (a, b) {
+        let aText = a.cells[col].textContent.trim(),
+            bText = b.cells[col].textContent.trim();
+        let aNum = parseFloat(aText) || 0;
+        let bNum = parseFloat(bText) || 0;
+        return reverse * ((aNum > bNum) - (bNum > aNum));
+    });
+    for(i = 0; i < tr.length; ++i) tb.appendChild(tr[i]);
+}
+function makeSortable(table) {
+    let th = table.tHead.rows[0].cells;
+    for(let i = 0; i < th.length; i++) {
+        (function(i){
+            let dir = 1;
+            th[i].addEventListener("click", function() {
+                sortTable(table, i, (dir = 1 - dir));
+            });
+        }(i));
+    }
+}
+function showTimeFrame(timeFrame) {
+    let tables = document.getElementsByClassName("data-table");
+    for(let i = 0; i < tables.length; i++) {
+        tables[i].style.display = "none";
+    }
+    document.getElementById("table_" + timeFrame).style.display = "table";
+}
+window.onload = function() {
+    let timeFrameSelect = document.getElementById("timeFrameSelect");
+    timeFrameSelect.addEventListener("change", function() {
+        showTimeFrame(this.value);
+    });
+    let tables = document.getElementsByClassName("data-table");
+    for(let i = 0; i < tables.length; i++) {
+        makeSortable(tables[i]);
+    }
+    showTimeFrame(timeFrameSelect.value);
+};
+</script>
+</head><body>
+<h1 style="text-align:center;">SEAL Player Report</h1>
+<div style="text-align:center; margin-bottom:20px;">
+<label for="timeFrameSelect">Time Frame: </label>
+<select id="timeFrameSelect">
+<option value="all_time">All Time</option>
+<option value="last_2_years">Last 2 Years</option>
+<option value="last_9_months">Last 9 Months</option>
+</select>
+</div>
+"""
+
+TABLE_HEAD = (
+    '<table id="table_{time_frame}" class="data-table" style="{display_style}">\n'
+    '<thead>\n'
+    '<tr>'
+    '<th>Player Name</th>'
+    '<th>Games Played</th>'
+    '<th>Overall Winrate (%)</th>'
+    '<th>Winrate Excl. Top 20 Heroes (%)</th>'
+    '<th><span class="tooltip">Discomfort Factor<span class="tooltiptext">Calculated as (Uncomfy Winrate / Comfy Winrate) x 100. If zero, set to 50.</span></span></th>'
+    '<th><span class="tooltip">Versatility Factor<span class="tooltiptext">The variety of different heroes a player has played.</span></span></th>'
+    '<th><span class="tooltip">Role Diversity Factor<span class="tooltiptext">Based on the entropy of roles played across all games.</span></span></th>'
+    '<th><span class="tooltip">Aggregated Value</span></th>'
+    '</tr>\n'
+    '</thead>\n'
+    '<tbody>\n'
+)
+ROW_TEMPLATE = "<tr><td class='name-column'><a href='{dotabuff_url}' target='_blank'>{name}</a></td>{cells}</tr>\n"
+CELL_TEMPLATE = '<td style="background-color:{color};">{value}</td>'
+NA_CELL = '<td>N/A</td>'
+# Display precision per metric column; the rest (game counts, aggregated value) print as-is
+CELL_FORMATS = dict.fromkeys((
+    'overall_winrate', 'winrate_excl_top20', 'discomfort_factor', 'versatility_factor', 'role_diversity_factor',
+), '.2f')
+TABLE_TAIL = '</tbody>\n</table>\n'
+REPORT_TAIL = '</body></html>'
+
 def generate_html_report(players_data, output_html):
-    # Collect metrics across all players and time frames for normalization
-    metrics = ['games_played', 'overall_winrate', 'winrate_excl_top20', 'discomfort_factor', 'versatility_factor', 'role_diversity_factor', 'aggregated_value']
-    metric_values = {tf: {metric: [] for metric in metrics} for tf in TIME_FRAMES.keys()}
+    # Running (min, max) per time frame and METRICS column, tracked as the values go by
+    metric_min_max = {tf: [None] * len(METRICS) for tf in TIME_FRAMES}
 
     for player_info in players_data.values():
         for time_frame, data in player_info['data'].items():
-            for metric in metrics:
+            bounds = metric_min_max[time_frame]
+            for column, metric in enumerate(METRICS):
+                value = data[metric]
+                if value == 'N/A':
+                    continue
+                lo_hi = bounds[column]
+                if lo_hi is None:
+                    bounds[column] = (value, value)
+                elif value < lo_hi[0]:
+                    bounds[column] = (value, lo_hi[1])
+                elif value > lo_hi[1]:
+                    bounds[column] = (lo_hi[0], value)
+
+    # Colour every cell up front, now that each column's range is known, so writing a
+    # row is only string concatenation
+    formats = [CELL_FORMATS.get(metric, '') for metric in METRICS]
+    row_cells = {tf: {} for tf in TIME_FRAMES}
+    for time_frame in TIME_FRAMES:
+        # Per column: (first GRADIENT step, column min, column span). A column whose values are
+        # all equal gets an infinite span, which pins it mid-gradient; one with no numbers
+        # falls back to 0-100
+        scales = []
+        for min_val, max_val in (lo_hi or (0, 100) for lo_hi in metric_min_max[time_frame]):
+            if max_val > min_val:
+                scales.append((0, min_val, max_val - min_val))
+            else:
+                scales.append((GRADIENT_STEPS // 2, min_val, math.inf))
+        for name, player_info in players_data.items():
+            data = player_info['data'][time_frame]
+            cells = []
+            for metric, (base, min_val, span), value_format in zip(METRICS, scales, formats):
                 value = data[metric]
                 if value != 'N/A':
-                    metric_values[time_frame][metric].append(float(value))
-
-    metric_min_max = {}
-    for time_frame in TIME_FRAMES.keys():
-        metric_min_max[time_frame] = {}
-        for metric in metrics:
-            values = metric_values[time_frame][metric]
-            metric_min_max[time_frame][metric] = (min(values) if values else 0, max(values) if values else 100)
-
-    # Generate HTML
-    with open(output_html, 'w', encoding='utf-8') as outfile:
-        outfile.write('<html><head><title>SEAL Player Report</title>\n')  # Changed title here
-        outfile.write('<style>\n')
-        outfile.write('body { font-family: Arial, sans-serif; background-color: #1e1e1e; color: #f0f0f0; }\n')
-        outfile.write('table { border-collapse: collapse; width: 80%; margin: 20px auto; }\n')
-        outfile.write('th, td { border: 1px solid #555; padding: 8px; text-align: center; }\n')
-        outfile.write('th { background-color: #333; color: #f0f0f0; cursor: pointer; position: relative; }\n')
-        outfile.write('tr:nth-child(even) { background-color: #2e2e2e; }\n')
-        outfile.write('tr:nth-child(odd) { background-color: #262626; }\n')
-        outfile.write('td.name-column {\n')
-        outfile.write('  background-color: #dcdcdc;\n')  # Slightly darker eggshell greyish color
-        outfile.write('}\n')
-        outfile.write('td.name-column a {\n')
-        outfile.write('  color: #1e90ff;\n')  # Dark blue color
-        outfile.write('  text-decoration: none;\n')
-        outfile.write('}\n')
-        outfile.write('td.name-column a:hover {\n')
-        outfile.write('  text-decoration: underline;\n')
-        outfile.write('}\n')
-        outfile.write('.tooltip {\n')
-        outfile.write('  position: relative;\n')
-        outfile.write('  display: inline-block;\n')
-        outfile.write('}\n')
-        outfile.write('.tooltip .tooltiptext {\n')
-        outfile.write('  visibility: hidden;\n')
-        outfile.write('  width: 250px;\n')
-        outfile.write('  background-color: #555;\n')
-        outfile.write('  color: #fff;\n')
-        outfile.write('  text-align: center;\n')
-        outfile.write('  border-radius: 6px;\n')
-        outfile.write('  padding: 5px;\n')
-        outfile.write('  position: absolute;\n')
-        outfile.write('  z-index: 1;\n')
-        outfile.write('  bottom: 125%;\n')
-        outfile.write('  left: 50%;\n')
-        outfile.write('  margin-left: -125px;\n')
-        outfile.write('  opacity: 0;\n')
-        outfile.write('  transition: opacity 0.3s;\n')
-        outfile.write('}\n')
-        outfile.write('.tooltip:hover .tooltiptext {\n')
-        outfile.write('  visibility: visible;\n')
-        outfile.write('  opacity: 1;\n')
-        outfile.write('}\n')
-        outfile.write('</style>\n')
-        outfile.write('<script>\n')
-        outfile.write('function sortTable(table, col, reverse) {\n')
-        outfile.write('    let tb = table.tBodies[0],\n')
-        outfile.write('        tr = Array.prototype.slice.call(tb.rows, 0),\n')
-        outfile.write('        i;\n')
-        outfile.write('    reverse = -((+reverse) || -1);\n')
-        outfile.write('    tr = tr.sort(function (a, b) {\n')
-        outfile.write('        let aText = a.cells[col].textContent.trim(),\n')
-        outfile.write('            bText = b.cells[col].textContent.trim();\n')
-        outfile.write('        let aNum = parseFloat(aText) || 0;\n')
-        outfile.write('        let bNum = parseFloat(bText) || 0;\n')
-        outfile.write('        return reverse * ((aNum > bNum) - (bNum > aNum));\n')
-        outfile.write('    });\n')
-        outfile.write('    for(i = 0; i < tr.length; ++i) tb.appendChild(tr[i]);\n')
-        outfile.write('}\n')
-        outfile.write('function makeSortable(table) {\n')
-        outfile.write('    let th = table.tHead.rows[0].cells;\n')
-        outfile.write('    for(let i = 0; i < th.length; i++) {\n')
-        outfile.write('        (function(i){\n')
-        outfile.write('            let dir = 1;\n')
-        outfile.write('            th[i].addEventListener("click", function() {\n')
-        outfile.write('                sortTable(table, i, (dir = 1 - dir));\n')
-        outfile.write('            });\n')
-        outfile.write('        }(i));\n')
-        outfile.write('    }\n')
-        outfile.write('}\n')
-        outfile.write('function showTimeFrame(timeFrame) {\n')
-        outfile.write('    let tables = document.getElementsByClassName("data-table");\n')
-        outfile.write('    for(let i = 0; i < tables.length; i++) {\n')
-        outfile.write('        tables[i].style.display = "none";\n')
-        outfile.write('    }\n')
-        outfile.write('    document.getElementById("table_" + timeFrame).style.display = "table";\n')
-        outfile.write('}\n')
-        outfile.write('window.onload = function() {\n')
-        outfile.write('    let timeFrameSelect = document.getElementById("timeFrameSelect");\n')
-        outfile.write('    timeFrameSelect.addEventListener("change", function() {\n')
-        outfile.write('        showTimeFrame(this.value);\n')
-        outfile.write('    });\n')
-        outfile.write('    let tables = document.getElementsByClassName("data-table");\n')
-        outfile.write('    for(let i = 0; i < tables.length; i++) {\n')
-        outfile.write('        makeSortable(tables[i]);\n')
-        outfile.write('    }\n')
-        # Set initial display state
-        outfile.write('    showTimeFrame(timeFrameSelect.value);\n')
-        outfile.write('};\n')
-        outfile.write('</script>\n')
-        outfile.write('</head><body>\n')
-        outfile.write('<h1 style="text-align:center;">SEAL Player Report</h1>\n')
-
-        # Time frame selection
-        outfile.write('<div style="text-align:center; margin-bottom:20px;">\n')
-        outfile.write('<label for="timeFrameSelect">Time Frame: </label>\n')
-        outfile.write('<select id="timeFrameSelect">\n')
-        outfile.write('<option value="all_time">All Time</option>\n')
-        outfile.write('<option value="last_2_years">Last 2 Years</option>\n')
-        outfile.write('<option value="last_9_months">Last 9 Months</option>\n')
-        outfile.write('</select>\n')
-        outfile.write('</div>\n')
+                    cells.append(CELL_TEMPLATE.format_map({
+                        # Same (value - min) / span normalisation as before, then scaled to a step
+                        'color': GRADIENT[base + round((value - min_val) / span * GRADIENT_STEPS)],
+                        'value': format(value, value_format),
+                    }))
+                else:
+                    cells.append(NA_CELL)
+            row_cells[time_frame][name] = ''.join(cells)
+
+    # Generate HTML: stream rows through a large buffer into a temp file, swapped in when complete
+    tmp_output = output_html + '.tmp'
+    with open(tmp_output, 'w', encoding='utf-8', buffering=WRITE_BUFFER) as outfile:
+        append = outfile.write
+        append(REPORT_HEAD)
 
         # Generate tables for each time frame
-        for time_frame in TIME_FRAMES.keys():
+        for time_frame in TIME_FRAMES:
             # Sort players by aggregated value for display purposes
-            players_data_sorted = sorted(players_data.values(), key=lambda x: float(x['data'][time_frame]['aggregated_value']) if x['data'][time_frame]['aggregated_value'] != 'N/A' else 0, reverse=True)
+            players_data_sorted = sorted(players_data.values(), key=lambda x: x['data'][time_frame]['aggregated_value'] if x['data'][time_frame]['aggregated_value'] != 'N/A' else 0, reverse=True)
 
             # Set initial display style
             display_style = "display: table;" if time_frame == 'all_time' else "display: none;"
-            outfile.write(f'<table id="table_{time_frame}" class="data-table" style="{display_style}">\n')
-            outfile.write('<thead>\n')
-            outfile.write('<tr>')
-            outfile.write('<th>Player Name</th>')
-            outfile.write('<th>Games Played</th>')
-            outfile.write('<th>Overall Winrate (%)</th>')
-            outfile.write('<th>Winrate Excl. Top 20 Heroes (%)</th>')
-            outfile.write('<th><span class="tooltip">Discomfort Factor<span class="tooltiptext">Calculated as (Uncomfy Winrate / Comfy Winrate) x 100. If zero, set to 50.</span></span></th>')
-            outfile.write('<th><span class="tooltip">Versatility Factor<span class="tooltiptext">The variety of different heroes a player has played.</span></span></th>')
-            outfile.write('<th><span class="tooltip">Role Diversity Factor<span class="tooltiptext">Based on the entropy of roles played across all games.</span></span></th>')
-            outfile.write('<th><span class="tooltip">Aggregated Value</span></th>')
-            outfile.write('</tr>\n')
-            outfile.write('</thead>\n')
-            outfile.write('<tbody>\n')
+            append(TABLE_HEAD.format(time_frame=time_frame, display_style=display_style))
+            cells = row_cells[time_frame]
 
             for player_info in players_data_sorted:
-                data = player_info['data'][time_frame]
-                dotabuff_url = player_info.get('dotabuff_url', '#')
-                outfile.write('<tr>')
-                outfile.write(f"<td class='name-column'><a href='{dotabuff_url}' target='_blank'>{player_info['name']}</a></td>")
-                # Apply color gradient to 'Games Played'
-                value = data['games_played']
-                if value != 'N/A':
-                    val_float = float(value)
-                    min_val, max_val = metric_min_max[time_frame]['games_played']
-                    if max_val > min_val:
-                        normalized = (val_float - min_val) / (max_val - min_val)
-                    else:
-                        normalized = 0.5
-                    hue = 30 + 90 * normalized  # From red to green
-                    saturation = 50 + 10 * normalized
-                    lightness = 25 + 10 * normalized
-                    color = f'hsl({hue:.0f}, {saturation:.0f}%, {lightness:.0f}%)'
-                    outfile.write(f'<td style="background-color:{color};">{value}</td>')
-                else:
-                    outfile.write('<td>N/A</td>')
-                for metric in metrics[1:]:
-                    value = data[metric]
-                    if value != 'N/A':
-                        val_float = float(value)
-                        min_val, max_val = metric_min_max[time_frame][metric]
-                        if max_val > min_val:
-                            normalized = (val_float - min_val) / (max_val - min_val)
-                        else:
-                            normalized = 0.5
-                        hue = 30 + 90 * normalized  # From red to green
-                        saturation = 50 + 10 * normalized
-                        lightness = 25 + 10 * normalized
-                        color = f'hsl({hue:.0f}, {saturation:.0f}%, {lightness:.0f}%)'
-                        outfile.write(f'<td style="background-color:{color};">{value}</td>')
-                    else:
-                        outfile.write('<td>N/A</td>')
-                outfile.write('</tr>\n')
-
-            outfile.write('</tbody>\n')
-            outfile.write('</table>\n')
-
-        outfile.write('</body></html>')
+                append(ROW_TEMPLATE.format_map({
+                    'dotabuff_url': player_info.get('dotabuff_url', '#'),
+                    'name': player_info['name'],
+                    'cells': cells[player_info['name']],
+                }))
+
+            append(TABLE_TAIL)
+
+        append(REPORT_TAIL)
+    os.replace(tmp_output, output_html)
 
 def main():
     parser = argparse.ArgumentParser(description='Generate Dota 2 Player Metrics Report')
@@ -510,12 +651,6 @@ def main():
 
     load_api_key()  # Load the API key before making any requests
 
-    if args.refresh:
-        # Delete the cache directory or specific cache files
-        if os.path.exists(CACHE_DIR):
-            shutil.rmtree(CACHE_DIR)
-            print("Cache cleared.")
-
     process_players(args.input_csv, args.output_html, refresh=args.refresh)
 
 if __name__ == '__main__':
@@ -2,12 +2,24 @@
 import json
 import re
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 from typing import Any, Dict, Optional, Tuple
 from urllib.parse import urljoin
 
 import requests
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from requests.adapters import HTTPAdapter
+
+try:
+    import lxml  # noqa: F401  (only needed so BeautifulSoup can use it)
+    HTML_PARSER = "lxml"
+except ImportError:  # optional: the pure-Python parser gives the same results, just slower
+    HTML_PARSER = "html.parser"
+
+# Both parsers only look inside <table>s; skip building the rest of the page
+_ONLY_TABLES = SoupStrainer("table")
 
 
 URL_HS = "https://windrun.io/ability-high-skill"
@@ -18,13 +30,37 @@ HEADERS = {
     "Accept": "text/html,application/xhtml+xml",
 }
 
+# Both pages live on windrun.io; one keep-alive pool saves the second TLS handshake
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=8))
+
 CACHE_DIR = Path("cache")
 CACHE_FILE = CACHE_DIR / "ability_high_skill.json"
 
 _num = re.compile(r"[-+]?\d*\.?\d+")
 
-def _first_match_float(text: str, pat: str) -> Optional[float]:
-    m = re.search(pat, text, re.IGNORECASE)
+# Link and stat patterns, compiled once instead of per row
+_ABIL_LINK_RE = re.compile(r"/abilities/\d+")
+_HERO_LINK_RE = re.compile(r"/heroes/\d+")
+_ABIL_HREF_RE = re.compile(r"^/abilities/\d+")
+_HERO_HREF_RE = re.compile(r"^/heroes/\d+")
+_HERO_OR_ABIL_HREF_RE = re.compile(r"^/(heroes|abilities)/\d+")
+_HS_ABIL_HREF_RE = re.compile(r"^/abilities/-?\d+")  # HS page: hero models have negative IDs
+_HS_ABIL_ID_RE = re.compile(r"^/abilities/(-?\d+)$")
+_HERO_ID_RE = re.compile(r"/heroes/(\d+)")
+_ABIL_ID_RE = re.compile(r"/abilities/(\d+)")
+_BODY_WR_RE = re.compile(r"(\d+(?:\.\d+)?)%\s*body winrate", re.IGNORECASE)
+_WIN_PCT_RE = re.compile(r"(\d+(?:\.\d+)?)%\s*win%", re.IGNORECASE)
+_AVG_PICK_RE = re.compile(r"/\s*(\d+(?:\.\d+)?)\s*avg pick", re.IGNORECASE)
+
+@lru_cache(maxsize=1024)
+def _ability_stats_re(ability_name: str) -> "re.Pattern[str]":
+    # Win% and avg pick anchored after this ability's name; compiled once per distinct name
+    return re.compile(re.escape(ability_name) + r".*?(\d+(?:\.\d+)?)%\s*win%.*?/\s*(\d+(?:\.\d+)?)\s*avg pick", re.IGNORECASE)
+
+def _first_match_float(text: str, regex: "re.Pattern[str]") -> Optional[float]:
+    m = regex.search(text)
     return float(m.group(1)) if m else None
 
 def _to_float(s: str) -> Optional[float]:
@@ -39,16 +75,16 @@ def _abs(base: str, maybe_url: Optional[str]) -> Optional[str]:
     return urljoin(base, maybe_url) if maybe_url else None
 
 
-def _parse_id_from_href(href: str, prefix: str) -> Optional[int]:
+def _parse_id_from_href(href: str, id_re: "re.Pattern[str]") -> Optional[int]:
     # Works for relative or absolute URLs
     if not href:
         return None
-    m = re.search(re.escape(prefix) + r"(\d+)", href)
+    m = id_re.search(href)
     return int(m.group(1)) if m else None
 
 
 def fetch_html(url: str) -> str:
-    r = requests.get(url, headers=HEADERS, timeout=25)
+    r = SESSION.get(url, timeout=25)
     r.raise_for_status()
     return r.text
 
@@ -62,9 +98,9 @@ def _pick_table_with_text(soup: BeautifulSoup, must_contain: str) -> Optional[An
         score = 0
         if must in txt:
             score += 3
-        if t.find("a", href=re.compile(r"/abilities/\d+")):
+        if t.find("a", href=_ABIL_LINK_RE):
             score += 2
-        if t.find("a", href=re.compile(r"/heroes/\d+")):
+        if t.find("a", href=_HERO_LINK_RE):
             score += 1
         if score > best_score:
             best_score = score
@@ -77,7 +113,7 @@ def parse_hs_table(html: str) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, Dict
       hs_abilities: ability_id (>0) -> {ability_id, ability_name, img, win_pct, pick_num}
       hs_models:   hero_name -> {model_ability_id (<0), hero_name, img, win_pct, pick_num}
     """
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=_ONLY_TABLES)
     table = soup.find("table")
     if not table:
         raise RuntimeError("Could not find table on ability-high-skill page")
@@ -109,7 +145,7 @@ def parse_hs_table(html: str) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, Dict
             continue
 
         # HS page links are /abilities/<id>, where hero models use negative IDs (e.g. /abilities/-35). :contentReference[oaicite:1]{index=1}
-        link = tr.find("a", href=re.compile(r"^/abilities/-?\d+"))
+        link = tr.find("a", href=_HS_ABIL_HREF_RE)
         if not link:
             continue
 
@@ -118,7 +154,7 @@ def parse_hs_table(html: str) -> Tuple[Dict[int, Dict[str, Any]], Dict[str, Dict
         if not name:
             continue
 
-        m = re.search(r"^/abilities/(-?\d+)$", href)
+        m = _HS_ABIL_ID_RE.search(href)
         if not m:
             continue
         abil_id = int(m.group(1))
@@ -157,9 +193,9 @@ def _pick_data_table_byhero(soup: BeautifulSoup) -> Optional[Any]:
     best_score = -1
     for t in soup.find_all("table"):
         score = 0
-        if t.find("a", href=re.compile(r"/heroes/\d+")):
+        if t.find("a", href=_HERO_LINK_RE):
             score += 2
-        if t.find("a", href=re.compile(r"/abilities/\d+")):
+        if t.find("a", href=_ABIL_LINK_RE):
             score += 2
         if "body winrate" in t.get_text(" ", strip=True).lower():
             score += 1
@@ -170,13 +206,13 @@ def _pick_data_table_byhero(soup: BeautifulSoup) -> Optional[Any]:
 
 
 def _nearest_prev_img_within(container, a_tag, base_url: str) -> Optional[str]:
-    last_img = None
-    for el in container.descendants:
-        if getattr(el, "name", None) == "img":
-            last_img = el
-        if el is a_tag:
+    # Walk backwards from the link; reaching the container's own tag means nothing before it matched
+    for el in a_tag.previous_elements:
+        if el is container:
             break
-    return _abs(base_url, last_img.get("src")) if last_img else None
+        if getattr(el, "name", None) == "img":
+            return _abs(base_url, el.get("src"))
+    return None
 
 
 def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
@@ -185,7 +221,7 @@ def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
     Uses a linear scan inside the correct table to associate abilities with the most recent hero link.
     """
     BASE = URL_BY_HERO
-    soup = BeautifulSoup(html, "html.parser")
+    soup = BeautifulSoup(html, HTML_PARSER, parse_only=_ONLY_TABLES)
 
     table = _pick_data_table_byhero(soup)
     if not table:
@@ -193,16 +229,17 @@ def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
 
     heroes: Dict[str, Dict[str, Any]] = {}
     current_hero: Optional[str] = None
+    seen_ability_ids: Dict[str, set] = {}  # hero -> ability IDs already appended, for the dedupe
 
     # Only scan within the data table (avoids nav/footer hero links)
-    links = table.find_all("a", href=re.compile(r"^/(heroes|abilities)/\d+"))
+    links = table.find_all("a", href=_HERO_OR_ABIL_HREF_RE)
 
     for link in links:
         href = link.get("href", "")
         text = link.get_text(" ", strip=True)
 
         if href.startswith("/heroes/"):
-            hero_id = _parse_id_from_href(href, "/heroes/")
+            hero_id = _parse_id_from_href(href, _HERO_ID_RE)
             hero_name = text
             hero_td = link.find_parent("td")
             hero_img = None
@@ -215,10 +252,9 @@ def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
 
             current_hero = hero_name
 
-            # body winrate is usually in the same hero <td>
-            hero_td = link.find_parent("td")
+            # body winrate is usually in the same hero <td> found above
             hero_td_text = hero_td.get_text(" ", strip=True) if hero_td else ""
-            m = re.search(r"(\d+(?:\.\d+)?)%\s*body winrate", hero_td_text, re.IGNORECASE)
+            m = _BODY_WR_RE.search(hero_td_text)
             body_winrate = float(m.group(1)) if m else None
 
             if current_hero not in heroes:
@@ -228,6 +264,7 @@ def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
                     "body_winrate": body_winrate,
                     "abilities": [],
                 }
+                seen_ability_ids[current_hero] = set()
             else:
                 # fill any missing basics
                 heroes[current_hero]["hero_id"] = heroes[current_hero].get("hero_id") or hero_id
@@ -241,33 +278,33 @@ def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
         if not current_hero:
             continue  # ignore abilities before we see the first hero
 
-        ability_id = _parse_id_from_href(href, "/abilities/")
+        ability_id = _parse_id_from_href(href, _ABIL_ID_RE)
         ability_name = text
         if not ability_id or not ability_name:
             continue
 
+        # dedupe before doing any of the text/regex/image work below
+        seen = seen_ability_ids[current_hero]
+        if ability_id in seen:
+            continue
+        seen.add(ability_id)
+
         # ability stats live in the enclosing block (often a <span> that contains the img + link + numbers)
         block = link.find_parent("span") or link.parent
         block_text = block.get_text(" ", strip=True) if block else ""
 
         # anchored stats after this ability name (safer than grabbing random numbers)
-        pat = re.escape(ability_name) + r".*?(\d+(?:\.\d+)?)%\s*win%.*?/\s*(\d+(?:\.\d+)?)\s*avg pick"
-        m = re.search(pat, block_text, re.IGNORECASE)
+        m = _ability_stats_re(ability_name).search(block_text)
         if m:
             win_pct = float(m.group(1))
             pick_num = float(m.group(2))
         else:
-            win_pct = _first_match_float(block_text, r"(\d+(?:\.\d+)?)%\s*win%")
-            pick_num = _first_match_float(block_text, r"/\s*(\d+(?:\.\d+)?)\s*avg pick")
+            win_pct = _first_match_float(block_text, _WIN_PCT_RE)
+            pick_num = _first_match_float(block_text, _AVG_PICK_RE)
 
         # ability img is typically right before the link inside the same block
         img = _nearest_prev_img_within(block or link.parent, link, BASE)
 
-        # dedupe
-        existing = {a.get("ability_id") for a in heroes[current_hero]["abilities"]}
-        if ability_id in existing:
-            continue
-
         heroes[current_hero]["abilities"].append({
             "ability_id": ability_id,
             "ability_name": ability_name,
@@ -280,8 +317,8 @@ def parse_by_hero(html: str) -> Dict[str, Dict[str, Any]]:
     heroes = {h: v for h, v in heroes.items() if v.get("abilities")}
 
     if not heroes:
-        hero_links_total = len(table.find_all("a", href=re.compile(r"^/heroes/\d+")))
-        ability_links_total = len(table.find_all("a", href=re.compile(r"^/abilities/\d+")))
+        hero_links_total = len(table.find_all("a", href=_HERO_HREF_RE))
+        ability_links_total = len(table.find_all("a", href=_ABIL_HREF_RE))
         raise RuntimeError(f"Parsed zero heroes. hero_links_total={hero_links_total} ability_links_total={ability_links_total}")
 
     return heroes
@@ -341,8 +378,11 @@ def save_cache(data: dict) -> None:
 def main() -> None:
     print("NOTE SOME ABILITIES MIGHT BE MISSING FROM HEROES, GO CHECK grimstroke (probably) for a dump of all the new abilities. You will need to manually enter them into the cache/ability_high_skill.json.")
     print("Fetching pages...")
-    hs_html = fetch_html(URL_HS)
-    byhero_html = fetch_html(URL_BY_HERO)
+    # The two pages are independent, so request them side by side
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        fut_hs = ex.submit(fetch_html, URL_HS)
+        fut_by = ex.submit(fetch_html, URL_BY_HERO)
+        hs_html, byhero_html = fut_hs.result(), fut_by.result()
     Path("byhero_debug.html").write_text(byhero_html, encoding="utf-8")
     print("Wrote byhero_debug.html")
 
@@ -7,10 +7,17 @@ import os
 import json
 import datetime
 
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
 CACHE_DIR = 'cache'
 REQUEST_DELAY = 1  # seconds
 API_KEY = None  # Will be loaded from opendota.properties
 
+SESSION = requests.Session()
+
 def load_api_key():
     global API_KEY
     properties_file = 'opendota.properties'
@@ -31,7 +38,7 @@ def make_api_request(url, params=None):
             params = {}
         params['api_key'] = API_KEY
     try:
-        response = requests.get(url, params=params)
+        response = SESSION.get(url, params=params)
         if response.status_code == 429:
             print("Rate limit exceeded. Sleeping for 60 seconds.")
             time.sleep(60)
@@ -57,17 +64,18 @@ def cache_data(filename, data):
     try:
         if not os.path.exists(CACHE_DIR):
             os.makedirs(CACHE_DIR)
-        with open(os.path.join(CACHE_DIR, filename), 'w', encoding='utf-8') as f:
-            json.dump(data, f)
+        raw = orjson.dumps(data) if orjson else json.dumps(data).encode('utf-8')
+        with open(os.path.join(CACHE_DIR, filename), 'wb') as f:
+            f.write(raw)
         print(f"Cached data to {filename}")
     except Exception as e:
         print(f"Error caching data to {filename}: {e}")
 
 def load_cached_data(filename):
     try:
-        with open(os.path.join(CACHE_DIR, filename), 'r', encoding='utf-8') as f:
+        with open(os.path.join(CACHE_DIR, filename), 'rb') as f:
             print(f"Loaded cached data from {filename}")
-            return json.load(f)
+            return (orjson or json).loads(f.read())
     except FileNotFoundError:
         print(f"Cache file {filename} not found.")
         return None